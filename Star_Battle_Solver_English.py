@@ -1,10 +1,48 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog
-import numpy as np
 from collections import defaultdict
 import json
 import time
-from copy import deepcopy
+
+# numpy is only needed once a solve starts; importing it lazily keeps the
+# GUI launch light
+np = None
+
+
+def _ensure_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+# Numba is optional: when it is installed the bit-level solver kernels are
+# compiled to machine code (cached on disk to avoid recompiling every launch);
+# without it they run as plain Python functions.
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+
+        def wrap(func):
+            return func
+        return wrap
+
+
+@njit(cache=True)
+def _has_adjacent_star(above, current, below, c, full_mask):
+    # True iff a star sits in the 8-neighborhood of column c, given the
+    # star bitmasks of the row itself and the rows above/below it.
+    bit = 1 << c
+    span = (bit | (bit << 1) | (bit >> 1)) & full_mask
+    if current & (span ^ bit):
+        return True
+    if above & span:
+        return True
+    if below & span:
+        return True
+    return False
 
 # --------------------------------------
 # StarBattleApp: GUI for Star Battle Solver
@@ -12,7 +50,7 @@ from copy import deepcopy
 class StarBattleApp:
     def __init__(self, root):
         self.root = root
-        self.root.title("Enhanced Star Battle Solver (Hybrid Snapshot Backtracking)")
+        self.root.title("Enhanced Star Battle Solver (Trail Backtracking)")
 
         # Initialize variables
         self.n = tk.IntVar(value=8)  # Board size (n x n)
@@ -32,7 +70,7 @@ class StarBattleApp:
             self.selected_color_idx.trace('w', lambda *args: self.update_color_preview())
 
         # Use -1 to represent unmarked cells
-        self.regions = np.full((self.n.get(), self.n.get()), -1, dtype=int)
+        self.regions = [[-1] * self.n.get() for _ in range(self.n.get())]
         self.solution = None
 
         # Build the interface
@@ -89,7 +127,7 @@ class StarBattleApp:
 
         n = self.n.get()
         # Initialize regions with -1 (unmarked)
-        self.regions = np.full((n, n), -1, dtype=int)
+        self.regions = [[-1] * n for _ in range(n)]
         self.cells = []
 
         # Create grid of buttons for the board
@@ -134,35 +172,35 @@ class StarBattleApp:
 
     def solve(self):
         # Solve the Star Battle puzzle
+        _ensure_numpy()
         n = self.n.get()
         k = self.k.get()
-        regions = self.regions.tolist()
 
         # Check if any regions are marked (all -1 means no markings)
-        if np.max(self.regions) == -1:
+        if max(max(row) for row in self.regions) == -1:
             messagebox.showerror("Error", "Please mark at least one region!")
             return
 
-        # Simple check for region sizes (skip -1)
-        region_sizes = defaultdict(int)
-        for r in range(n):
-            for c in range(n):
-                rid = self.regions[r][c]
-                if rid == -1:
-                    continue
-                region_sizes[rid] += 1
-
-        for rid, size in region_sizes.items():
-            if size < k:
-                messagebox.showerror("Error", f"Region {rid} is too small ({size} cells), cannot place {k} stars!")
-                return
+        # Simple check for region sizes (skip -1) via a vectorized bincount
+        flat = np.asarray(self.regions).ravel()
+        counts = np.bincount(flat[flat != -1])
+        too_small = np.where((counts > 0) & (counts < k))[0]
+        if too_small.size:
+            rid = int(too_small[0])
+            size = int(counts[rid])
+            messagebox.showerror("Error", f"Region {rid} is too small ({size} cells), cannot place {k} stars!")
+            return
 
         self.status_label.config(text="Solving...")
         self.root.update()
 
         start_time = time.time()
-        solver = ImprovedStarBattleSolver(n, self.regions.tolist(), k, unlabeled=-1)
-        solution = solver.solve(timeout=600)
+        solver = ImprovedStarBattleSolver(n, self.regions, k, unlabeled=-1)
+        # Large boards get the multi-process portfolio search
+        if n >= 12:
+            solution = solver.parallel_solve(timeout=600)
+        else:
+            solution = solver.solve(timeout=600)
 
         if not solution:
             self.status_label.config(text="No solution")
@@ -204,7 +242,7 @@ class StarBattleApp:
             data = {
                 "n": self.n.get(),
                 "k": self.k.get(),
-                "regions": self.regions.tolist()
+                "regions": self.regions
             }
 
             with open(filepath, 'w') as f:
@@ -229,8 +267,9 @@ class StarBattleApp:
                 self.n.set(data["n"])
                 self.k.set(data["k"])
 
-                loaded_regions = np.array(data["regions"])
-                if loaded_regions.shape != (data["n"], data["n"]):
+                loaded_regions = data["regions"]
+                if (len(loaded_regions) != data["n"] or
+                        any(len(row) != data["n"] for row in loaded_regions)):
                     messagebox.showerror("Error", "Region data size mismatch")
                     return
 
@@ -261,26 +300,39 @@ class StarBattleApp:
 # --------------------------------------
 # ImprovedStarBattleSolver: Enhanced solver
 #   - Supports unlabeled = -1 (skipped)
+#   - Board state kept as per-row/per-column bitmasks
 #   - Includes defensive checks and final validation
 # --------------------------------------
 class ImprovedStarBattleSolver:
     def __init__(self, n, regions, k, unlabeled=-1):
+        _ensure_numpy()
         self.n = n  # Board size
         self.k = k  # Stars per row/column/region
-        self.regions = regions  # Region matrix
+        # Region ids fit comfortably in 16 bits (palette has 19 colors,
+        # -1 sentinel for unlabeled); a compact array keeps the grid scans
+        # cache-friendly and cheap to ship to worker processes.
+        self.regions = np.asarray(regions, dtype=np.int16)
         self.unlabeled = unlabeled  # Value for unmarked cells
-        self.solution = set()  # Set of star positions
+
+        # Bitboard state: bit c of row_stars[r] is set iff (r, c) has a star
+        self.full_mask = (1 << n) - 1
+        self.row_stars = [0] * n
+
+        # Bit c of row_forbidden[r] is set iff (r, c) is forbidden by at least
+        # one source; forbidden_counts keeps the per-cell count so overlapping
+        # forbids can be undone correctly. int8 is plenty: at most 8 neighbor
+        # forbids plus one branching mark per cell.
+        self.row_forbidden = [0] * n
+        self.forbidden_counts = np.zeros((n, n), dtype=np.int8)
 
         # Counters for remaining stars needed
         self.rows_needed = [k] * n
         self.cols_needed = [k] * n
         self.regs_needed = defaultdict(int)  # Default 0 for unmarked regions
 
-        # Forbidden counts for cells (due to adjacent stars)
-        self.forbidden_counts = defaultdict(int)
-
-        # Precompute neighbors (8-direction)
-        self.neighbors = {}
+        # Precompute neighbors (8-direction) as a flat table indexed by
+        # r * n + c, so the hot loops index by int instead of hashing a tuple
+        self.neighbors = []
         for r in range(n):
             for c in range(n):
                 neigh = []
@@ -291,166 +343,429 @@ class ImprovedStarBattleSolver:
                         nr, nc = r + dr, c + dc
                         if 0 <= nr < n and 0 <= nc < n:
                             neigh.append((nr, nc))
-                self.neighbors[(r, c)] = neigh
+                self.neighbors.append(tuple(neigh))
 
-        # Group cells by region (skip unlabeled)
-        self.region_cells = defaultdict(list)
+        # Group cells by region (skip unlabeled). Region ids can be sparse
+        # (they are GUI color indices), so they get dense indices and the
+        # cells are stored CSR-style: region i's cells are the flat r*n+c
+        # codes in region_cell_idx[region_offsets[i]:region_offsets[i+1]]
+        cells_by_region = defaultdict(list)
         for r in range(n):
             for c in range(n):
-                rid = self.regions[r][c]
+                rid = self.regions[r, c]
                 if rid == unlabeled:
                     continue
-                self.region_cells[rid].append((r, c))
+                cells_by_region[rid].append(r * n + c)
+
+        # Keep first-encountered (row-major) order: selection tie-breaking
+        # depends on it, and grid scan order is the established behavior
+        self.region_ids = list(cells_by_region)
+        self.region_index = {rid: i for i, rid in enumerate(self.region_ids)}
+        self.region_offsets = np.zeros(len(self.region_ids) + 1, dtype=np.int32)
+        np.cumsum([len(cells_by_region[rid]) for rid in self.region_ids],
+                  out=self.region_offsets[1:])
+        self.region_cell_idx = np.array(
+            [idx for rid in self.region_ids for idx in cells_by_region[rid]],
+            dtype=np.int32)
 
         # Initialize stars needed for each marked region
-        for rid in self.region_cells:
+        for rid in self.region_ids:
             self.regs_needed[rid] = k
 
+        # Trail of (container, key, old_value) entries for cheap undo;
+        # backtracking pops back to a mark instead of restoring snapshots
+        self.trail = []
+
+        # Each region as (row, column-mask) pairs, so scanning a region is a
+        # popcount/bit-extraction over a few row words instead of a Python
+        # loop over cell tuples
+        self.region_rowmasks = {}
+        for rid, cells in cells_by_region.items():
+            rowmask = defaultdict(int)
+            for idx in cells:
+                rowmask[idx // n] |= 1 << (idx % n)
+            self.region_rowmasks[rid] = sorted(rowmask.items())
+
+        # Incrementally maintained availability: bit c of row_placeable[r]
+        # caches the full can-place check for (r, c); row/col/reg_avail count
+        # the placeable cells per line and region so MRV scoring is O(1)
+        self.row_placeable = [0] * n
+        self.row_avail = [0] * n
+        self.col_avail = [0] * n
+        self.reg_avail = defaultdict(int)
+        for r in range(n):
+            for c in range(n):
+                if self._compute_placeable(r, c):
+                    self.row_placeable[r] |= 1 << c
+                    self.row_avail[r] += 1
+                    self.col_avail[c] += 1
+                    rid = self.regions[r, c]
+                    if rid != unlabeled:
+                        self.reg_avail[rid] += 1
+
+        # Detect left-right mirror symmetry of the region layout (region ids
+        # may differ as long as the partition mirrors onto itself); only then
+        # does the lexicographic first-star restriction prune real duplicates
+        self.mirror_symmetric = self._detect_mirror_symmetry()
+
+        # Dirty worklists for AC-style propagation: rows/columns/regions whose
+        # availability or demand changed since they were last checked. Seeded
+        # with everything so the first propagation does one full pass.
+        self.dirty_rows = set(range(n))
+        self.dirty_cols = set(range(n))
+        self.dirty_regs = set(self.region_ids)
+
+        # Freshness counter for _update_cell: within one mutation event (a
+        # placement's forbid-and-sweep cascade) a cell can be touched by a
+        # neighbor forbid, a row sweep, a column sweep and a region sweep;
+        # the generation stamp lets all but the first touch return early
+        self.update_gen = 0
+        self.cell_gen = [[-1] * n for _ in range(n)]
+
+        # One-time instance preprocessing: force placements and forbids that
+        # follow from the region geometry alone
+        self._preprocess_regions()
+
+        # Nogood store: signatures (star masks, forbidden masks) of states
+        # whose subtrees were fully refuted. Since the masks determine every
+        # derived counter, hitting a stored signature means the same dead
+        # subtree, however a different branching order reached it.
+        self.nogoods = set()
+        self.max_nogoods = 200000
+
         # Statistics
         self.nodes_visited = 0
         self.propagations = 0
-
-    def can_place_star(self, r, c):
-        # Check if a star can be placed at (r, c)
-        if (r, c) in self.solution:
-            return False
-        if self.forbidden_counts.get((r, c), 0) > 0:
+        self.nogood_hits = 0
+
+    @staticmethod
+    def _iter_bits(mask):
+        # Yield the positions of the set bits of mask, lowest first
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask &= mask - 1
+
+    def _trail_set(self, container, key, value):
+        # Record the old value on the trail, then assign
+        self.trail.append((container, key, container[key]))
+        container[key] = value
+
+    def undo_to(self, mark):
+        # Pop trail entries down to mark, reversing each assignment
+        trail = self.trail
+        while len(trail) > mark:
+            container, key, old = trail.pop()
+            container[key] = old
+
+    def has_adjacent_star(self, r, c):
+        # Check whether any of the 8 neighbors of (r, c) has a star
+        above = self.row_stars[r - 1] if r > 0 else 0
+        below = self.row_stars[r + 1] if r + 1 < self.n else 0
+        return _has_adjacent_star(above, self.row_stars[r], below, c, self.full_mask)
+
+    def _compute_placeable(self, r, c):
+        # Full check of whether a star can be placed at (r, c). This runs
+        # inside every update cascade, so attribute loads are hoisted and
+        # the adjacency kernel is called directly.
+        row_stars = self.row_stars
+        bit = 1 << c
+        if (row_stars[r] | self.row_forbidden[r]) & bit:
             return False
         if self.rows_needed[r] <= 0 or self.cols_needed[c] <= 0:
             return False
-        rid = self.regions[r][c]
+        rid = self.regions[r, c]
         if rid != self.unlabeled and self.regs_needed.get(rid, 0) <= 0:
             return False
         # Check if any neighbor already has a star
-        for nr, nc in self.neighbors[(r, c)]:
-            if (nr, nc) in self.solution:
-                return False
+        above = row_stars[r - 1] if r > 0 else 0
+        below = row_stars[r + 1] if r + 1 < self.n else 0
+        if _has_adjacent_star(above, row_stars[r], below, c, self.full_mask):
+            return False
         return True
 
+    def can_place_star(self, r, c):
+        # Check if a star can be placed at (r, c); O(1) via the cached mask
+        return self.row_placeable[r] >> c & 1 == 1
+
+    def _update_cell(self, r, c):
+        # Recompute placeability of one cell and adjust the running counts;
+        # a cell already refreshed in the current generation is up to date.
+        # Hottest function in the solver: the trail writes are inlined
+        # rather than routed through _trail_set.
+        if self.cell_gen[r][c] == self.update_gen:
+            return
+        self.cell_gen[r][c] = self.update_gen
+        new = self._compute_placeable(r, c)
+        row_placeable = self.row_placeable
+        if new == (row_placeable[r] >> c & 1 == 1):
+            return
+        trail = self.trail
+        row_avail = self.row_avail
+        col_avail = self.col_avail
+        trail.append((row_placeable, r, row_placeable[r]))
+        row_placeable[r] ^= 1 << c
+        delta = 1 if new else -1
+        trail.append((row_avail, r, row_avail[r]))
+        row_avail[r] += delta
+        trail.append((col_avail, c, col_avail[c]))
+        col_avail[c] += delta
+        rid = self.regions[r, c]
+        # Mark the touched constraints dirty; stale entries are harmless
+        # (re-checking a clean constraint is a no-op), so the worklists are
+        # deliberately not trailed
+        self.dirty_rows.add(r)
+        self.dirty_cols.add(c)
+        if rid != self.unlabeled:
+            reg_avail = self.reg_avail
+            trail.append((reg_avail, rid, reg_avail[rid]))
+            reg_avail[rid] += delta
+            self.dirty_regs.add(rid)
+
+    def _update_after_place(self, r, c):
+        # Refresh availability after a star: the cell itself changed (its
+        # neighbors were already refreshed by forbid_cell); if a
+        # row/column/region counter just hit zero, every remaining cell of
+        # that line/region flips
+        self._update_cell(r, c)
+        if self.rows_needed[r] == 0:
+            for cc in range(self.n):
+                self._update_cell(r, cc)
+        if self.cols_needed[c] == 0:
+            for rr in range(self.n):
+                self._update_cell(rr, c)
+        rid = self.regions[r, c]
+        if rid != self.unlabeled and self.regs_needed[rid] == 0:
+            i = self.region_index[rid]
+            for idx in self.region_cell_idx[self.region_offsets[i]:self.region_offsets[i + 1]]:
+                self._update_cell(int(idx) // self.n, int(idx) % self.n)
+
+    def _region_cells(self, rid):
+        # Materialize region rid's cells as (r, c) pairs from the CSR store
+        i = self.region_index[rid]
+        return [divmod(int(idx), self.n)
+                for idx in self.region_cell_idx[self.region_offsets[i]:self.region_offsets[i + 1]]]
+
+    def forbid_cell(self, r, c):
+        # Bump the forbidden count of (r, c), trailing both the count and
+        # the row bit so undo_to reverses it. Each forbid starts a new
+        # update generation; the board state a cell's placeability depends
+        # on is stable until the next forbid or placement.
+        self.update_gen += 1
+        self._trail_set(self.forbidden_counts, (r, c), self.forbidden_counts[r, c] + 1)
+        if self.forbidden_counts[r, c] == 1:
+            self._trail_set(self.row_forbidden, r, self.row_forbidden[r] | (1 << c))
+            self._update_cell(r, c)
+
+    def forbid_neighbors(self, r, c):
+        # Bump forbidden counts around (r, c)
+        for nr, nc in self.neighbors[r * self.n + c]:
+            self.forbid_cell(nr, nc)
+
     def place_star_forced(self, r, c):
         # Place a star with defensive checks (for constraint propagation)
-        for nr, nc in self.neighbors[(r, c)]:
-            if (nr, nc) in self.solution:
-                return False
+        if self.has_adjacent_star(r, c):
+            return False
 
-        self.solution.add((r, c))
-        self.rows_needed[r] -= 1
-        self.cols_needed[c] -= 1
-        rid = self.regions[r][c]
+        self._trail_set(self.row_stars, r, self.row_stars[r] | (1 << c))
+        self._trail_set(self.rows_needed, r, self.rows_needed[r] - 1)
+        self._trail_set(self.cols_needed, c, self.cols_needed[c] - 1)
+        rid = self.regions[r, c]
         if rid != self.unlabeled:
-            self.regs_needed[rid] -= 1
+            self._trail_set(self.regs_needed, rid, self.regs_needed[rid] - 1)
 
         # Update forbidden counts for neighbors
-        for nr, nc in self.neighbors[(r, c)]:
-            self.forbidden_counts[(nr, nc)] += 1
+        self.forbid_neighbors(r, c)
+        self._update_after_place(r, c)
 
         return True
 
     def place_star(self, r, c):
-        # Place a star and return affected forbidden cells
+        # Place a star, trailing every mutation for undo
         # Defensive check for adjacent stars
-        for nr, nc in self.neighbors[(r, c)]:
-            if (nr, nc) in self.solution:
-                raise RuntimeError("Attempting to place star adjacent to existing star")
-
-        self.solution.add((r, c))
-        self.rows_needed[r] -= 1
-        self.cols_needed[c] -= 1
-        rid = self.regions[r][c]
-        if rid != self.unlabeled:
-            self.regs_needed[rid] -= 1
-
-        new_forbidden = []
-        for nr, nc in self.neighbors[(r, c)]:
-            self.forbidden_counts[(nr, nc)] += 1
-            if self.forbidden_counts[(nr, nc)] == 1:
-                new_forbidden.append((nr, nc))
-
-        return new_forbidden
-
-    def remove_star(self, r, c, new_forbidden):
-        # Remove a star and restore state
-        self.solution.remove((r, c))
-        self.rows_needed[r] += 1
-        self.cols_needed[c] += 1
-        rid = self.regions[r][c]
+        if self.has_adjacent_star(r, c):
+            raise RuntimeError("Attempting to place star adjacent to existing star")
+
+        self._trail_set(self.row_stars, r, self.row_stars[r] | (1 << c))
+        self._trail_set(self.rows_needed, r, self.rows_needed[r] - 1)
+        self._trail_set(self.cols_needed, c, self.cols_needed[c] - 1)
+        rid = self.regions[r, c]
         if rid != self.unlabeled:
-            self.regs_needed[rid] += 1
+            self._trail_set(self.regs_needed, rid, self.regs_needed[rid] - 1)
 
-        # Restore forbidden counts
-        for nr, nc in new_forbidden:
-            self.forbidden_counts[(nr, nc)] -= 1
-            if self.forbidden_counts[(nr, nc)] == 0:
-                del self.forbidden_counts[(nr, nc)]
+        self.forbid_neighbors(r, c)
+        self._update_after_place(r, c)
 
     def propagate_constraints(self):
-        # Propagate constraints until no more changes
-        changed = True
-        while changed:
-            changed = False
-            self.propagations += 1
-
-            # Check rows
-            for r in range(self.n):
+        # Drain the dirty worklists, forcing placements where a constraint's
+        # availability exactly matches its demand; placements mark further
+        # constraints dirty, so this runs to the fixpoint
+        self.propagations += 1
+        dirty_rows = self.dirty_rows
+        dirty_cols = self.dirty_cols
+        dirty_regs = self.dirty_regs
+
+        # Three drain phases (rows, columns, regions). Forced placements
+        # mutate shared state and can invalidate each other, so each phase
+        # applies serially; parallelism lives at the search level instead
+        # (parallel_solve), where subtrees are independent.
+        while dirty_rows or dirty_cols or dirty_regs:
+            while dirty_rows:
+                r = dirty_rows.pop()
                 if self.rows_needed[r] > 0:
-                    valid_positions = [c for c in range(self.n) if self.can_place_star(r, c)]
-                    if len(valid_positions) == self.rows_needed[r]:
-                        for c in valid_positions:
-                            if self.place_star_forced(r, c):
-                                changed = True
-                    elif len(valid_positions) < self.rows_needed[r]:
+                    if self.row_avail[r] < self.rows_needed[r]:
                         return False
-
-            # Check columns
-            for c in range(self.n):
+                    if self.row_avail[r] == self.rows_needed[r]:
+                        for c in self._iter_bits(self.row_placeable[r]):
+                            if self.can_place_star(r, c):
+                                self.place_star_forced(r, c)
+            while dirty_cols:
+                c = dirty_cols.pop()
                 if self.cols_needed[c] > 0:
-                    valid_positions = [r for r in range(self.n) if self.can_place_star(r, c)]
-                    if len(valid_positions) == self.cols_needed[c]:
-                        for r in valid_positions:
-                            if self.place_star_forced(r, c):
-                                changed = True
-                    elif len(valid_positions) < self.cols_needed[c]:
+                    if self.col_avail[c] < self.cols_needed[c]:
                         return False
-
-            # Check regions
-            for region_id, cells in self.region_cells.items():
+                    if self.col_avail[c] == self.cols_needed[c]:
+                        valid_positions = [r for r in range(self.n) if self.can_place_star(r, c)]
+                        for r in valid_positions:
+                            if self.can_place_star(r, c):
+                                self.place_star_forced(r, c)
+            while dirty_regs:
+                region_id = dirty_regs.pop()
                 if self.regs_needed[region_id] > 0:
-                    valid_positions = [(r, c) for (r, c) in cells if self.can_place_star(r, c)]
-                    if len(valid_positions) == self.regs_needed[region_id]:
-                        for r, c in valid_positions:
-                            if self.place_star_forced(r, c):
-                                changed = True
-                    elif len(valid_positions) < self.regs_needed[region_id]:
+                    if self.reg_avail[region_id] < self.regs_needed[region_id]:
                         return False
+                    if self.reg_avail[region_id] == self.regs_needed[region_id]:
+                        valid_positions = [(r, c)
+                                           for r, mask in self.region_rowmasks[region_id]
+                                           for c in self._iter_bits(self.row_placeable[r] & mask)]
+                        for r, c in valid_positions:
+                            if self.can_place_star(r, c):
+                                self.place_star_forced(r, c)
 
         return True
 
+    def _preprocess_regions(self):
+        # (a) A region with exactly k cells must have a star on every cell
+        for rid in self.region_ids:
+            cells = self._region_cells(rid)
+            if len(cells) == self.k:
+                for r, c in cells:
+                    if self.can_place_star(r, c):
+                        self.place_star_forced(r, c)
+
+        # (b)/(c) Confinement: if m regions (m = 1 or 2) all fit inside the
+        # same m rows, those rows' m*k stars are claimed by them, so cells of
+        # other regions in those rows can never hold a star; same for columns
+        row_spans = {rid: {r for r, _ in self._region_cells(rid)}
+                     for rid in self.region_ids}
+        col_spans = {rid: {c for _, c in self._region_cells(rid)}
+                     for rid in self.region_ids}
+        self._forbid_confined_lines(row_spans, by_rows=True)
+        self._forbid_confined_lines(col_spans, by_rows=False)
+
+    def _forbid_confined_lines(self, spans, by_rows):
+        # Apply the confinement rule for every span of one or two lines
+        candidates = {frozenset(s) for s in spans.values() if len(s) <= 2}
+        candidates.update(frozenset(a | b)
+                          for a in spans.values() if len(a) <= 2
+                          for b in spans.values() if len(b) <= 2
+                          and len(a | b) == 2)
+        for lines in candidates:
+            inside = [rid for rid, s in spans.items() if s <= lines]
+            if len(inside) != len(lines):
+                continue
+            for line in lines:
+                for i in range(self.n):
+                    r, c = (line, i) if by_rows else (i, line)
+                    if self.regions[r, c] not in inside and self.can_place_star(r, c):
+                        self.forbid_cell(r, c)
+
+    def _detect_mirror_symmetry(self):
+        # True iff mirroring the board left-right maps the region partition
+        # onto itself under some renaming of region ids
+        forward = {}
+        backward = {}
+        for r in range(self.n):
+            for c in range(self.n):
+                a = self.regions[r, c]
+                b = self.regions[r, self.n - 1 - c]
+                if (a == self.unlabeled) != (b == self.unlabeled):
+                    return False
+                if a == self.unlabeled:
+                    continue
+                if forward.setdefault(a, b) != b or backward.setdefault(b, a) != a:
+                    return False
+        return True
+
+    def select_symmetry_cell(self):
+        # Lexicographic restriction on the topmost unfilled row: branch on
+        # its leftmost placeable cell. Applied while the board is still
+        # star-free, this enumerates the position of the first star left to
+        # right, and each refuted column stays forbidden on the trail, so
+        # an ordering and its mirror image are never both explored
+        for r in range(self.n):
+            if self.rows_needed[r] > 0:
+                mask = self.row_placeable[r]
+                if mask:
+                    return (r, (mask & -mask).bit_length() - 1)
+                return None
+        return None
+
     def select_next_cell(self):
+        # Branch inside the tightest region: the one with the smallest
+        # availability-to-demand ratio, taking the cell with the fewest
+        # row+column alternatives within it
+        best_rid = None
+        best_ratio = float('inf')
+        for rid in self.region_ids:
+            needed = self.regs_needed[rid]
+            if needed > 0:
+                ratio = self.reg_avail[rid] / needed
+                if ratio < best_ratio:
+                    best_ratio = ratio
+                    best_rid = rid
+
+        if best_rid is not None:
+            best_cell = None
+            min_score = float('inf')
+            for r, mask in self.region_rowmasks[best_rid]:
+                for c in self._iter_bits(self.row_placeable[r] & mask):
+                    score = self.row_avail[r] + self.col_avail[c]
+                    if score < min_score:
+                        min_score = score
+                        best_cell = (r, c)
+            if best_cell is not None:
+                return best_cell
+
+        # All regions satisfied (possible with unlabeled cells): fall back
+        # to the additive MRV scan over every placeable cell
+        return self._select_mrv_cell()
+
+    def _select_mrv_cell(self):
         # Select the next cell to try (most constrained)
         best_cell = None
         min_choices = float('inf')
         max_constraints = -1
 
         for r in range(self.n):
-            for c in range(self.n):
-                if self.can_place_star(r, c):
-                    # Calculate available choices in row, column, and region
-                    available_in_row = sum(1 for cc in range(self.n) if self.can_place_star(r, cc))
-                    available_in_col = sum(1 for rr in range(self.n) if self.can_place_star(rr, c))
-                    rid = self.regions[r][c]
-                    available_in_region = 0
-                    if rid != self.unlabeled:
-                        available_in_region = sum(1 for (rr, cc) in self.region_cells[rid] if self.can_place_star(rr, cc))
-
-                    choices = available_in_row + available_in_col + available_in_region
-                    constraints = len([1 for nr, nc in self.neighbors[(r, c)] if self.can_place_star(nr, nc)])
-
-                    # Select cell with fewest choices and most constraints
-                    if (choices < min_choices or
-                            (choices == min_choices and constraints > max_constraints)):
-                        min_choices = choices
-                        max_constraints = constraints
-                        best_cell = (r, c)
+            for c in self._iter_bits(self.row_placeable[r]):
+                # Available choices in row, column, and region come from
+                # the incrementally maintained counts
+                rid = self.regions[r, c]
+                available_in_region = 0
+                if rid != self.unlabeled:
+                    available_in_region = self.reg_avail[rid]
+
+                choices = self.row_avail[r] + self.col_avail[c] + available_in_region
+                constraints = sum(1 for nr, nc in self.neighbors[r * self.n + c]
+                                  if self.can_place_star(nr, nc))
+
+                # Select cell with fewest choices and most constraints
+                if (choices < min_choices or
+                        (choices == min_choices and constraints > max_constraints)):
+                    min_choices = choices
+                    max_constraints = constraints
+                    best_cell = (r, c)
 
         return best_cell
 
@@ -461,96 +776,228 @@ class ImprovedStarBattleSolver:
                 all(x == 0 for x in self.regs_needed.values()))
 
     def is_impossible(self):
-        # Check if current state is impossible
+        # Check if current state is impossible using the running counts
         for r in range(self.n):
-            available = sum(1 for c in range(self.n) if self.can_place_star(r, c))
-            if available < self.rows_needed[r]:
+            if self.row_avail[r] < self.rows_needed[r]:
                 return True
 
         for c in range(self.n):
-            available = sum(1 for r in range(self.n) if self.can_place_star(r, c))
-            if available < self.cols_needed[c]:
+            if self.col_avail[c] < self.cols_needed[c]:
                 return True
 
-        for region_id, cells in self.region_cells.items():
-            available = sum(1 for r, c in cells if self.can_place_star(r, c))
-            if available < self.regs_needed[region_id]:
+        for region_id in self.region_ids:
+            if self.reg_avail[region_id] < self.regs_needed[region_id]:
                 return True
 
         return False
 
-    def _restore_from_snapshot(self, snapshot):
-        # Restore state from snapshot
-        self.rows_needed = list(snapshot['rows_needed'])
-        self.cols_needed = list(snapshot['cols_needed'])
-        self.regs_needed = defaultdict(lambda: 0)
-        self.regs_needed.update(snapshot['regs_needed'])
-        self.forbidden_counts = defaultdict(int, snapshot['forbidden_counts'])
-        self.solution = set(snapshot['solution'])
+    def get_solution(self):
+        # Extract star positions from the row bitmasks
+        return {(r, c) for r in range(self.n)
+                for c in self._iter_bits(self.row_stars[r])}
 
     def validate_no_adjacent(self):
-        # Validate that no stars are adjacent
-        for (r, c) in list(self.solution):
-            for nr, nc in self.neighbors[(r, c)]:
-                if (nr, nc) in self.solution:
+        # Validate that no stars are adjacent: one vectorized pass that
+        # counts the stars in every 3x3 window (a convolution with a box
+        # kernel) and flags star cells whose window holds more than itself
+        n = self.n
+        stars = np.zeros((n, n), dtype=np.uint8)
+        for (r, c) in self.get_solution():
+            stars[r, c] = 1
+        padded = np.pad(stars, 1)
+        window = sum(padded[dr:dr + n, dc:dc + n]
+                     for dr in range(3) for dc in range(3))
+        bad = (stars == 1) & (window > 1)
+        if bad.any():
+            r, c = map(int, np.argwhere(bad)[0])
+            for nr, nc in self.neighbors[r * n + c]:
+                if stars[nr, nc]:
                     return False, (r, c), (nr, nc)
         return True, None, None
 
+    def _record_nogood(self, sig):
+        # Remember a refuted state; the store is bounded, dropping it
+        # wholesale when full (losing pruning, never soundness)
+        if len(self.nogoods) >= self.max_nogoods:
+            self.nogoods.clear()
+        self.nogoods.add(sig)
+
     def backtrack(self, start_time, timeout):
-        # Backtracking search with snapshot restoration
-        self.nodes_visited += 1
+        # Iterative backtracking search over an explicit decision stack:
+        # no Python frame per node and no recursion-limit ceiling. Each
+        # stack entry is [r, c, phase, mark] where phase 0 means the star
+        # branch is being explored and phase 1 the forbid branch.
+        decision_stack = []
 
-        # Check timeout
-        if time.time() - start_time > timeout:
-            return False
+        while True:
+            self.nodes_visited += 1
 
-        # Propagate constraints
-        if not self.propagate_constraints():
-            return False
+            # Check timeout
+            if time.time() - start_time > timeout:
+                return False
 
-        # Check if solution is complete
-        if self.is_complete():
-            return True
+            failed = False
 
-        # Check if current state is impossible
-        if self.is_impossible():
-            return False
+            # Propagate constraints, then check for completion / dead end
+            if not self.propagate_constraints():
+                failed = True
+            elif self.is_complete():
+                return True
+            elif self.is_impossible():
+                failed = True
+            elif (sig := (tuple(self.row_stars), tuple(self.row_forbidden))) in self.nogoods:
+                # This exact state was already refuted along another path
+                self.nogood_hits += 1
+                failed = True
+            else:
+                # Select next cell and branch: try placing a star first.
+                # On mirror-symmetric boards the star-free prefix of the
+                # search applies the lexicographic first-star rule, so the
+                # board's very first star is enumerated left to right with
+                # every refuted column staying forbidden on the trail; once
+                # a star is down (and on boards without the symmetry) MRV
+                # picks the most constrained cell.
+                cell = None
+                if self.mirror_symmetric and not any(self.row_stars):
+                    cell = self.select_symmetry_cell()
+                if cell is None:
+                    cell = self.select_next_cell()
+                if cell is None:
+                    failed = True
+                else:
+                    r, c = cell
+                    mark = len(self.trail)
+                    self.place_star(r, c)
+                    decision_stack.append([r, c, 0, mark, sig])
+
+            if failed:
+                # Unwind: flip the deepest star branch to its forbid
+                # branch, popping fully explored decisions and recording
+                # each refuted state as a nogood
+                while decision_stack:
+                    frame = decision_stack[-1]
+                    self.undo_to(frame[3])
+                    if frame[2] == 0:
+                        frame[2] = 1
+                        self.forbid_cell(frame[0], frame[1])
+                        break
+                    self._record_nogood(decision_stack.pop()[4])
+                else:
+                    return False
 
-        # Select next cell to try
-        cell = self.select_next_cell()
-        if not cell:
-            return False
+    def _split_jobs(self, depth):
+        # Expand the top of the search tree to the given depth and return
+        # the branch prefixes as lists of ('star'|'forbid', r, c) decisions;
+        # prefixes refuted by propagation are dropped on the spot
+        jobs = []
+        ops = []
 
-        r, c = cell
+        def expand(d):
+            if not self.propagate_constraints():
+                return
+            if d == 0 or self.is_complete():
+                jobs.append(list(ops))
+                return
+            if self.is_impossible():
+                return
+            cell = self.select_next_cell()
+            if cell is None:
+                jobs.append(list(ops))
+                return
+            r, c = cell
+            mark = len(self.trail)
+            self.place_star(r, c)
+            ops.append(('star', r, c))
+            expand(d - 1)
+            ops.pop()
+            self.undo_to(mark)
+            self.forbid_cell(r, c)
+            ops.append(('forbid', r, c))
+            expand(d - 1)
+            ops.pop()
+            self.undo_to(mark)
+
+        mark0 = len(self.trail)
+        expand(depth)
+        self.undo_to(mark0)
+        return jobs
+
+    def parallel_solve(self, timeout=600, nproc=None, split_depth=3):
+        # Portfolio-style parallel search: split the search space into up to
+        # 2^split_depth branch prefixes and explore them in worker processes,
+        # returning as soon as any worker finds a solution
+        import multiprocessing
 
-        # Take snapshot of current state
-        snapshot = {
-            'rows_needed': list(self.rows_needed),
-            'cols_needed': list(self.cols_needed),
-            'regs_needed': dict(self.regs_needed),
-            'forbidden_counts': dict(self.forbidden_counts),
-            'solution': set(self.solution)
-        }
+        start_time = time.time()
 
-        # Try placing a star
-        new_forbidden = self.place_star(r, c)
-        if self.backtrack(start_time, timeout):
-            return True
-        self._restore_from_snapshot(snapshot)
+        if not self.propagate_constraints():
+            return None
+        if self.is_complete() or self.is_impossible():
+            return self.solve(timeout=timeout)
 
-        # Try not placing a star (mark as forbidden)
-        self.forbidden_counts[(r, c)] += 1
-        if self.backtrack(start_time, timeout):
-            return True
-        self.forbidden_counts[(r, c)] -= 1
-        if self.forbidden_counts.get((r, c), 0) == 0:
-            self.forbidden_counts.pop((r, c), None)
+        jobs = self._split_jobs(split_depth)
+        if not jobs:
+            return None
 
-        self._restore_from_snapshot(snapshot)
-        return False
+        if nproc is None:
+            nproc = multiprocessing.cpu_count()
+        if nproc <= 1 or len(jobs) <= 1:
+            return self.solve(timeout=timeout - (time.time() - start_time))
+
+        remaining = timeout - (time.time() - start_time)
+        args = [(self.n, self.regions, self.k, self.unlabeled, ops, remaining)
+                for ops in jobs]
+        with multiprocessing.Pool(min(nproc, len(jobs))) as pool:
+            for solution in pool.imap_unordered(_solve_branch, args):
+                if solution:
+                    pool.terminate()
+                    return solution
+        return None
+
+    def _solve_cpsat(self, timeout):
+        # Encode the instance for the CP-SAT solver: one boolean per cell,
+        # exactly-k sums per row/column/region, and pairwise at-most-one on
+        # the right/down/diagonal neighbor pairs (which covers the full
+        # 8-neighborhood once per pair). CDCL learning, restarts and the
+        # parallel worker pool come with the backend.
+        from ortools.sat.python import cp_model
+
+        n, k = self.n, self.k
+        model = cp_model.CpModel()
+        x = [[model.NewBoolVar(f"x_{r}_{c}") for c in range(n)] for r in range(n)]
+
+        for r in range(n):
+            model.Add(sum(x[r]) == k)
+        for c in range(n):
+            model.Add(sum(x[r][c] for r in range(n)) == k)
+        for rid in self.region_ids:
+            model.Add(sum(x[r][c] for r, c in self._region_cells(rid)) == k)
+        for r in range(n):
+            for c in range(n):
+                for dr, dc in ((0, 1), (1, -1), (1, 0), (1, 1)):
+                    nr, nc = r + dr, c + dc
+                    if 0 <= nr < n and 0 <= nc < n:
+                        model.Add(x[r][c] + x[nr][nc] <= 1)
+
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = timeout
+        status = solver.Solve(model)
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return {(r, c) for r in range(n) for c in range(n)
+                    if solver.BooleanValue(x[r][c])}
+        return None
+
+    def solve(self, timeout=600, backend='search'):
+        # Main solving method. backend='cpsat' hands the instance to
+        # or-tools CP-SAT when it is installed (worthwhile on hard
+        # instances); the built-in search remains the default and the
+        # fallback when or-tools is missing.
+        if backend == 'cpsat':
+            try:
+                return self._solve_cpsat(timeout)
+            except ImportError:
+                print("or-tools not installed, falling back to built-in search")
 
-    def solve(self, timeout=600):
-        # Main solving method
         start_time = time.time()
 
         # Initial constraint propagation
@@ -563,7 +1010,7 @@ class ImprovedStarBattleSolver:
             if not ok:
                 print("Validation failed: adjacent stars", a, b)
                 return None
-            return self.solution
+            return self.get_solution()
 
         # Check if impossible
         if self.is_impossible():
@@ -575,11 +1022,29 @@ class ImprovedStarBattleSolver:
             if not ok:
                 print("Validation failed: adjacent stars", a, b)
                 return None
-            return self.solution
+            return self.get_solution()
 
         return None
 
 
+# Worker for ImprovedStarBattleSolver.parallel_solve: rebuild the solver in
+# the child process, replay the branch prefix (propagating between decisions
+# so forced placements match the parent's expansion), then search the subtree
+def _solve_branch(args):
+    n, regions, k, unlabeled, ops, timeout = args
+    solver = ImprovedStarBattleSolver(n, regions, k, unlabeled=unlabeled)
+    for kind, r, c in ops:
+        if not solver.propagate_constraints():
+            return None
+        if kind == 'star':
+            if not solver.can_place_star(r, c):
+                return None
+            solver.place_star(r, c)
+        else:
+            solver.forbid_cell(r, c)
+    return solver.solve(timeout=timeout)
+
+
 # Entry point
 if __name__ == "__main__":
     root = tk.Tk()